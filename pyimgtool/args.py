@@ -2,8 +2,8 @@
 
 import argparse
 import logging
+import os
 import sys
-import textwrap
 from typing import List, Tuple
 
 from pyimgtool.data_structures import Position
@@ -11,10 +11,18 @@ from pyimgtool.version import __version__
 
 LOG = logging.getLogger(__name__)
 
+# parser action dests that are not user options
+_EXCLUDED_DESTS = frozenset(("help", "version", argparse.SUPPRESS))
+_POSITION_LOOKUP = Position.lookup()
+_POSITION_CHOICES_STR = ", ".join(Position.choices())
+
 
 class CustomFormatter(argparse.RawTextHelpFormatter):
     """Format help messages to custom spec."""
 
+    _SubParsersAction = argparse._SubParsersAction
+    _ChoicesPseudoAction = argparse._SubParsersAction._ChoicesPseudoAction
+
     def _format_action_invocation(self, action):
         if not action.option_strings:
             (metavar,) = self._metavar_formatter(action, action.dest)(1)
@@ -49,13 +57,7 @@ class CustomFormatter(argparse.RawTextHelpFormatter):
         return help
 
     def _format_action(self, action):
-        if type(action) == argparse._SubParsersAction:
-            # inject new class variable for subcommand formatting
-            subactions = action._get_subactions()
-            invocations = [self._format_action_invocation(a) for a in subactions]
-            self._subcommand_max_length = max(len(i) for i in invocations)
-
-        if type(action) == argparse._SubParsersAction._ChoicesPseudoAction:
+        if isinstance(action, self._ChoicesPseudoAction):
             # format subcommand help line
             subcommand = self._format_action_invocation(action)  # type: str
             width = self._subcommand_max_length
@@ -64,10 +66,14 @@ class CustomFormatter(argparse.RawTextHelpFormatter):
                 help_text = self._expand_help(action)
             return f"  {subcommand:{width}}    {help_text}\n"
 
-        elif type(action) == argparse._SubParsersAction:
+        elif isinstance(action, self._SubParsersAction):
             # process subcommand help section
+            subactions = action._get_subactions()
+            # inject new class variable for subcommand formatting
+            invocations = [self._format_action_invocation(a) for a in subactions]
+            self._subcommand_max_length = max(len(i) for i in invocations)
             msg = "\n"
-            for subaction in action._get_subactions():
+            for subaction in subactions:
                 msg += self._format_action(subaction)
             return msg
         else:
@@ -84,16 +90,17 @@ class OrderedNamespace(argparse.Namespace):
     def __init__(self, commands, **kwargs):
         """Pass possible commands to namespace."""
         self.__dict__["_order"] = []
-        self._commands = [*commands.choices]
+        self.__dict__["_commands"] = frozenset(commands.choices)
         super().__init__(**kwargs)
 
     def __setattr__(self, attr, value):
         """Set order of commands called."""
         super().__setattr__(attr, value)
         if attr in self._commands:
-            if attr in self._order:
-                self.__dict__["_order"].clear()
-            self.__dict__["_order"].append(attr)
+            order = self.__dict__["_order"]
+            if attr in order:
+                order.clear()
+            order.append(attr)
 
     def ordered(self):
         """Return namespace in order.
@@ -115,7 +122,7 @@ def split_to_tuple(arg: str) -> Tuple[float, ...]:
     -------
     Tuple of split args
     """
-    return tuple([float(i) for i in arg.split(",")])
+    return tuple(map(float, arg.split(",")))
 
 
 def position(s):
@@ -135,69 +142,52 @@ def position(s):
     argparse.ArgumentTypeError
         If validation is failed
     """
-    names = {str(x): x for x in list(Position)}
-    vals = {x.value: x for x in list(Position)}
-    try:
-        return {**names, **vals}[s.lower()]
-    except KeyError:
-        strs = ", ".join(Position.choices())
+    pos = _POSITION_LOOKUP.get(s.lower())
+    if pos is None:
         raise argparse.ArgumentTypeError(
-            f"{s} is an invalid position. Valid choices are: {strs}"
+            f"{s} is an invalid position. Valid choices are: {_POSITION_CHOICES_STR}"
         )
+    return pos
 
 
-def parse_args(args: List[str]) -> OrderedNamespace:
-    """Parse command line arguments.
+def quality(s):
+    """Parse JPEG quality setting from CLI.
 
-    Args:
-        args: Command line arguments
+    Parameters
+    ----------
+    s
+        Value to convert to integer quality
 
-    Return: 2-tuple of Argparse namespace of parsed arguments and list of commands called
+    Returns
+    -------
+    Validated quality
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        If validation is failed
     """
-    # flags
-    desc = textwrap.dedent(
-        """\
-        A command-line utility which uses the Pillow module to
-        manipulate images for web vewing.
+    try:
+        q = int(s)
+    except ValueError:
+        q = -1
+    if not 0 <= q <= 100:
+        raise argparse.ArgumentTypeError(
+            f"{s} is an invalid quality. Must be an integer between 0 and 100"
+        )
+    return q
 
-        Images can be resampled, resized, and compressed at custom
-        quality levels. Watermarking can also be added.
-        """
-    )
-    parser = argparse.ArgumentParser(description=desc, formatter_class=CustomFormatter)
-    parser.add_argument(
-        "-v",
-        help="increase logging output to console",
-        action="count",
-        dest="verbosity",
-        default=0,
-    )
-    parser.add_argument(
-        "-Q",
-        "--quiet",
-        help="quiet debug log output to console (opposite of -v)",
-        action="store_true",
-        dest="quiet",
-    )
-    parser.add_argument(
-        "-V", "--version", action="version", version=f"%(prog)s {__version__}"
-    )
-    commands = parser.add_subparsers(
-        title="commands",
-        description="image operations (may be chained)",
-        metavar="COMMAND",
-    )
 
-    # Commands
-    # Open
-    open_cmd = commands.add_parser("open", help="open image for editing")
-    open_cmd.add_argument(
+def _add_open_args(cmd: argparse.ArgumentParser, nargs=None):
+    """Add arguments shared by the open commands."""
+    cmd.add_argument(
         "input",
         help="image file to process",
         type=argparse.FileType(mode="rb"),
         metavar="INPUT_FILE",
+        nargs=nargs,
     )
-    open_cmd.add_argument(
+    cmd.add_argument(
         "-H",
         "--histogram",
         help="print image histogram to console",
@@ -205,39 +195,10 @@ def parse_args(args: List[str]) -> OrderedNamespace:
         action="store_true",
     )
 
-    # Open2
-    open2_cmd = commands.add_parser("open2", help="open image for editing with opencv")
-    open2_cmd.add_argument(
-        "input",
-        help="image file to process",
-        type=argparse.FileType(mode="rb"),
-        metavar="INPUT_FILE",
-        nargs="+",
-    )
-    open2_cmd.add_argument(
-        "-H",
-        "--histogram",
-        help="print image histogram to console",
-        dest="show_histogram",
-        action="store_true",
-    )
 
-    # Mat
-    mat_cmd = commands.add_parser(
-        "mat", help="add a mat of a specific size for printing"
-    )
-    mat_cmd.add_argument(
-        "size",
-        help="dimensions of mat, in inches",
-        metavar="SIZE",
-        type=split_to_tuple,
-    )
-    mat_cmd.add_argument(
-        "-d", "--dpi", help="Dots per inch for mat", type=int, default=300
-    )
-    # Resize
-    resize_cmd = commands.add_parser("resize", help="resize image dimensions",)
-    resize_cmd.add_argument(
+def _add_resize_args(cmd: argparse.ArgumentParser):
+    """Add arguments shared by the resize commands."""
+    cmd.add_argument(
         "-s",
         "--scale",
         help="scale output size",
@@ -245,112 +206,39 @@ def parse_args(args: List[str]) -> OrderedNamespace:
         metavar="SCALE",
         type=float,
     )
-    resize_cmd.add_argument(
+    cmd.add_argument(
         "-W", "--width", help="absolute width of output", metavar="PX", type=int,
     )
-    resize_cmd.add_argument(
+    cmd.add_argument(
         "-H", "--height", help="absolute height of output", metavar="PX", type=int,
     )
-    resize_cmd.add_argument(
+    cmd.add_argument(
         "-L", "--longest", help="longest dimension of output", metavar="PX", type=int,
     )
-    resize_cmd.add_argument(
+    cmd.add_argument(
         "-S", "--shortest", help="shortest dimension of output", metavar="PX", type=int,
     )
 
-    # Resize2
-    resize2_cmd = commands.add_parser(
-        "resize2", help="resize image dimensions using opencv",
-    )
-    resize2_cmd.add_argument(
-        "-s", "--scale", help="scale output size", metavar="SCALE", type=float,
-    )
-    resize2_cmd.add_argument(
-        "-W", "--width", help="absolute width of output", metavar="PX", type=int,
-    )
-    resize2_cmd.add_argument(
-        "-H", "--height", help="absolute height of output", metavar="PX", type=int,
-    )
-    resize2_cmd.add_argument(
-        "-L", "--longest", help="longest dimension of output", metavar="PX", type=int,
-    )
-    resize2_cmd.add_argument(
-        "-S", "--shortest", help="shortest dimension of output", metavar="PX", type=int,
-    )
-    resize2_cmd.add_argument(
-        "-f",
-        "--force",
-        help="force exact dimensions, cropping or adding whitespace if needed",
-        action="store_true",
-    )
-
-    # Watermark
-    watermark_cmd = commands.add_parser("watermark", help="add watermark to image")
-    watermark_cmd.add_argument(
-        "image",
-        help="image file to use as watermark",
-        type=argparse.FileType("rb"),
-        metavar="IMAGE",
-    )
-    watermark_cmd.add_argument(
-        "-i", "--invert", help="invert watermark image", action="store_true"
-    )
-    watermark_cmd.add_argument(
-        "-m",
-        "--margin",
-        help="padding around watermark (multiplied by watermark size)",
-        type=float,
-        default=0.05,
-    )
-    watermark_cmd.add_argument(
-        "-r",
-        "--rotation",
-        help="angle of watermark rotation",
-        metavar="ANGLE",
-        type=int,
-        default=0,
-    )
-    watermark_cmd.add_argument(
-        "-o", "--opacity", help="watermark opacity", type=float, default=0.3,
-    )
-    watermark_cmd.add_argument(
-        "-p",
-        "--position",
-        help="watermark position",
-        metavar="POSITION",
-        type=position,
-    )
-    watermark_cmd.add_argument(
-        "-s",
-        "--scale",
-        help="watermark scale in percent of image size",
-        default=0.2,
-        type=float,
-    )
 
-    # Watermark2
-    watermark2_cmd = commands.add_parser(
-        "watermark2",
-        help="add watermark to image using numpy and opencv",
-        epilog=f"Valid positions are: {', '.join(Position.choices())}",
-    )
-    watermark2_cmd.add_argument(
+def _add_watermark_args(cmd: argparse.ArgumentParser):
+    """Add arguments shared by the watermark commands."""
+    cmd.add_argument(
         "image",
         help="image file to use as watermark",
         type=argparse.FileType("rb"),
         metavar="IMAGE",
     )
-    watermark2_cmd.add_argument(
+    cmd.add_argument(
         "-i", "--invert", help="invert watermark image", action="store_true"
     )
-    watermark2_cmd.add_argument(
+    cmd.add_argument(
         "-m",
         "--margin",
         help="padding around watermark (multiplied by watermark size)",
         type=float,
         default=0.05,
     )
-    watermark2_cmd.add_argument(
+    cmd.add_argument(
         "-r",
         "--rotation",
         help="angle of watermark rotation",
@@ -358,17 +246,17 @@ def parse_args(args: List[str]) -> OrderedNamespace:
         type=int,
         default=0,
     )
-    watermark2_cmd.add_argument(
+    cmd.add_argument(
         "-o", "--opacity", help="watermark opacity", type=float, default=0.3,
     )
-    watermark2_cmd.add_argument(
+    cmd.add_argument(
         "-p",
         "--position",
         help="watermark position",
         metavar="POSITION",
         type=position,
     )
-    watermark2_cmd.add_argument(
+    cmd.add_argument(
         "-s",
         "--scale",
         help="watermark scale in percent of image size",
@@ -378,18 +266,20 @@ def parse_args(args: List[str]) -> OrderedNamespace:
         type=float,
     )
 
-    # Text
-    text_cmd = commands.add_parser("text", help="add text to image")
-    text_cmd.add_argument(
+
+def _add_text_args(cmd: argparse.ArgumentParser):
+    """Add arguments shared by the text commands."""
+    cmd.add_argument(
         "text", help="text to display on image", metavar="TEXT", type=str
     )
-    text_cmd.add_argument(
+    cmd.add_argument(
         "-c",
         "--copyright",
         help="display TEXT as copyright message after © and date taken",
+        dest="copyright",
         action="store_true",
     )
-    text_cmd.add_argument(
+    cmd.add_argument(
         "-r",
         "--rotation",
         help="angle of text rotation",
@@ -397,7 +287,7 @@ def parse_args(args: List[str]) -> OrderedNamespace:
         type=int,
         default=0,
     )
-    text_cmd.add_argument(
+    cmd.add_argument(
         "-o",
         "--opacity",
         help="opacity of text layer",
@@ -405,10 +295,10 @@ def parse_args(args: List[str]) -> OrderedNamespace:
         metavar="OPACITY",
         default=0.3,
     )
-    text_cmd.add_argument(
+    cmd.add_argument(
         "-p", "--position", help="position of text", metavar="POSITION", type=position,
     )
-    text_cmd.add_argument(
+    cmd.add_argument(
         "-s",
         "--scale",
         help="scale of text relative to image width",
@@ -416,41 +306,85 @@ def parse_args(args: List[str]) -> OrderedNamespace:
         type=float,
     )
 
-    # Text2
-    text2_cmd = commands.add_parser("text2", help="add text to image using opencv")
-    text2_cmd.add_argument(
-        "text", help="text to display on image", metavar="TEXT", type=str
+
+def _build_open(commands: argparse._SubParsersAction):
+    """Add `open` command parser."""
+    open_cmd = commands.add_parser("open", help="open image for editing")
+    _add_open_args(open_cmd)
+
+
+def _build_open2(commands: argparse._SubParsersAction):
+    """Add `open2` command parser."""
+    open2_cmd = commands.add_parser("open2", help="open image for editing with opencv")
+    _add_open_args(open2_cmd, nargs="+")
+
+
+def _build_mat(commands: argparse._SubParsersAction):
+    """Add `mat` command parser."""
+    mat_cmd = commands.add_parser(
+        "mat", help="add a mat of a specific size for printing"
     )
-    text2_cmd.add_argument(
-        "-c",
-        "--copyright",
-        help="display TEXT as copyright message after © and date taken",
-        dest="copyright",
-        action="store_true",
+    mat_cmd.add_argument(
+        "size",
+        help="dimensions of mat, in inches",
+        metavar="SIZE",
+        type=split_to_tuple,
     )
-    text2_cmd.add_argument(
-        "-r",
-        "--rotation",
-        help="angle of text rotation",
-        metavar="ANGLE",
-        type=int,
-        default=0,
+    mat_cmd.add_argument(
+        "-d", "--dpi", help="Dots per inch for mat", type=int, default=300
     )
-    text2_cmd.add_argument(
-        "-o", "--opacity", help="opacity of text layer", type=float, default=0.3,
+
+
+def _build_resize(commands: argparse._SubParsersAction):
+    """Add `resize` command parser."""
+    resize_cmd = commands.add_parser("resize", help="resize image dimensions",)
+    _add_resize_args(resize_cmd)
+
+
+def _build_resize2(commands: argparse._SubParsersAction):
+    """Add `resize2` command parser."""
+    resize2_cmd = commands.add_parser(
+        "resize2", help="resize image dimensions using opencv",
     )
-    text2_cmd.add_argument(
-        "-p", "--position", help="position of text", metavar="POSITION", type=position,
+    _add_resize_args(resize2_cmd)
+    resize2_cmd.add_argument(
+        "-f",
+        "--force",
+        help="force exact dimensions, cropping or adding whitespace if needed",
+        action="store_true",
     )
-    text2_cmd.add_argument(
-        "-s",
-        "--scale",
-        help="scale of text relative to image width",
-        default=0.20,
-        type=float,
+
+
+def _build_watermark(commands: argparse._SubParsersAction):
+    """Add `watermark` command parser."""
+    watermark_cmd = commands.add_parser("watermark", help="add watermark to image")
+    _add_watermark_args(watermark_cmd)
+
+
+def _build_watermark2(commands: argparse._SubParsersAction):
+    """Add `watermark2` command parser."""
+    watermark2_cmd = commands.add_parser(
+        "watermark2",
+        help="add watermark to image using numpy and opencv",
+        epilog=f"Valid positions are: {_POSITION_CHOICES_STR}",
     )
+    _add_watermark_args(watermark2_cmd)
+
+
+def _build_text(commands: argparse._SubParsersAction):
+    """Add `text` command parser."""
+    text_cmd = commands.add_parser("text", help="add text to image")
+    _add_text_args(text_cmd)
+
+
+def _build_text2(commands: argparse._SubParsersAction):
+    """Add `text2` command parser."""
+    text2_cmd = commands.add_parser("text2", help="add text to image using opencv")
+    _add_text_args(text2_cmd)
+
 
-    # Sharpen
+def _build_sharpen(commands: argparse._SubParsersAction):
+    """Add `sharpen` command parser."""
     sharpen_cmd = commands.add_parser("sharpen", help="sharpen edges of image")
     sharpen_cmd.add_argument(
         "amount",
@@ -469,12 +403,13 @@ def parse_args(args: List[str]) -> OrderedNamespace:
         metavar="N",
     )
 
-    # Save
+
+def _build_save(commands: argparse._SubParsersAction):
+    """Add `save` command parser."""
     save_cmd = commands.add_parser("save", help="save edited file to disk")
     save_cmd.add_argument(
         "output",
         help="file to save processed image",
-        type=argparse.FileType(mode="w"),
         metavar="OUTPUT_FILE",
         nargs="?",
     )
@@ -493,13 +428,32 @@ def parse_args(args: List[str]) -> OrderedNamespace:
     )
     save_cmd.add_argument(
         "-q",
-        help="Quality setting for jpeg files (an integer between 1 and 100; default: 75)",
-        type=lambda n: 0 <= int(n) <= 100
-        or parser.error("quality must be between 0 and 100"),
+        help=(
+            "Quality setting for jpeg files (an integer between 0 and 100)"
+            " (default: 75)\nunmodified jpegs are copied as is unless given"
+        ),
+        type=quality,
         dest="jpg_quality",
-        default=75,
         metavar="QUALITY",
     )
+    save_cmd.add_argument(
+        "--subsampling",
+        help=(
+            "chroma subsampling for jpeg files (0: 4:4:4, 1: 4:2:2, 2: 4:2:0)"
+            " (default: 2)"
+        ),
+        type=int,
+        choices=(0, 1, 2),
+    )
+    save_cmd.add_argument(
+        "--optimize-jpeg",
+        help=(
+            "run extra pass to optimize jpeg huffman tables for a smaller file\n"
+            "(progressive jpegs, used for inputs over 10 kB, always optimize)"
+        ),
+        dest="optimize_jpeg",
+        action="store_true",
+    )
     save_cmd.add_argument(
         "-s",
         "--suffix",
@@ -508,6 +462,111 @@ def parse_args(args: List[str]) -> OrderedNamespace:
         default="_edited",
     )
 
+
+# parser builders by command name, in the order listed in help
+COMMAND_BUILDERS = {
+    "open": _build_open,
+    "open2": _build_open2,
+    "mat": _build_mat,
+    "resize": _build_resize,
+    "resize2": _build_resize2,
+    "watermark": _build_watermark,
+    "watermark2": _build_watermark2,
+    "text": _build_text,
+    "text2": _build_text2,
+    "sharpen": _build_sharpen,
+    "save": _build_save,
+}
+_COMMAND_NAMES = frozenset(COMMAND_BUILDERS)
+
+
+def _version_requested(args: List[str]) -> bool:
+    """Check top-level args for version flag without building the parser.
+
+    Parameters
+    ----------
+    args
+        Command line arguments
+
+    Returns
+    -------
+    True if -V/--version comes before any help flag or command
+    """
+    for arg in args:
+        if not arg.startswith("-") or arg in ("-h", "--help"):
+            return False
+        if arg in ("-V", "--version"):
+            return True
+    return False
+
+
+def parse_args(args: List[str]) -> OrderedNamespace:
+    """Parse command line arguments.
+
+    Args:
+        args: Command line arguments
+
+    Return: 2-tuple of Argparse namespace of parsed arguments and list of commands called
+    """
+    # answer version queries before paying for parser construction
+    if _version_requested(args):
+        print(f"{os.path.basename(sys.argv[0])} {__version__}")
+        sys.exit(0)
+
+    # split argv by known commands and parse
+    command_names = _COMMAND_NAMES
+    current: List[str] = []
+    split_argv: List[List[str]] = [current]
+    commands_found = []
+    for c in args:
+        if c in command_names:
+            commands_found.append(c)
+            current = [c]
+            split_argv.append(current)
+        else:
+            current.append(c)
+
+    # flags
+    desc = (
+        "A command-line utility which uses the Pillow module to\n"
+        "manipulate images for web vewing.\n"
+        "\n"
+        "Images can be resampled, resized, and compressed at custom\n"
+        "quality levels. Watermarking can also be added.\n"
+    )
+    parser = argparse.ArgumentParser(description=desc, formatter_class=CustomFormatter)
+    parser.add_argument(
+        "-v",
+        help="increase logging output to console",
+        action="count",
+        dest="verbosity",
+        default=0,
+    )
+    parser.add_argument(
+        "-Q",
+        "--quiet",
+        help="quiet debug log output to console (opposite of -v)",
+        action="store_true",
+        dest="quiet",
+    )
+    parser.add_argument(
+        "-V", "--version", action="version", version=f"%(prog)s {__version__}"
+    )
+    commands = parser.add_subparsers(
+        title="commands",
+        description="image operations (may be chained)",
+        metavar="COMMAND",
+    )
+
+    # only build parsers for commands that were called; top-level help or
+    # an unknown command needs all of them so every choice is listed
+    build_all = not commands_found or any(
+        c in ("-h", "--help") or not c.startswith("-") for c in split_argv[0]
+    )
+    for name, build in COMMAND_BUILDERS.items():
+        if build_all or name in commands_found:
+            build(commands)
+
     for _, subp in commands.choices.items():
         subp.formatter_class = CustomFormatter
 
@@ -518,24 +577,11 @@ def parse_args(args: List[str]) -> OrderedNamespace:
 
     # user-defined opts on the main parser that we will remove from
     # the namespaces of the lower-level parsers
-    top_level_opts = [
+    top_level_opts = frozenset(
         action.dest
         for action in parser._actions
-        if action.dest not in ["help", "version", "==SUPPRESS=="]
-    ]
-
-    # split argv by known commands and parse
-    split_argv: List[List] = [[]]
-    commands_found = []
-    for c in sys.argv[1:]:
-        if c in commands.choices:
-            commands_found.append(c)
-            if c == "-h" and len(split_argv) >= 1:
-                split_argv[-1].append(c)
-            else:
-                split_argv.append([c])
-        else:
-            split_argv[-1].append(c)
+        if action.dest not in _EXCLUDED_DESTS
+    )
 
     # Initialize namespace
     ns = OrderedNamespace(commands)
@@ -550,9 +596,8 @@ def parse_args(args: List[str]) -> OrderedNamespace:
     for argv in split_argv[1:]:
         n = argparse.Namespace()
         setattr(ns, argv[0], n)
-        parser.parse_args(argv, namespace=n)
-        for opt in top_level_opts:
-            delattr(n, opt)
+        # the subparser doesn't own top-level options, so none end up in `n`
+        commands.choices[argv[0]].parse_args(argv[1:], namespace=n)
 
     # basic validation
     if ns.quiet > 0:
@@ -560,10 +605,9 @@ def parse_args(args: List[str]) -> OrderedNamespace:
 
     # give top-level args their own namespace
     top = argparse.Namespace()
-    for k, v in ns.__dict__.items():
-
-        if k in top_level_opts:
-            setattr(top, k, v)
+    top.__dict__.update(
+        {k: v for k, v in ns.__dict__.items() if k in top_level_opts}
+    )
     setattr(ns, "_top_level", top)
     for a in top_level_opts:
         delattr(ns, a)
@@ -3,42 +3,547 @@
 import logging
 import os
 import sys
+import tempfile
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from io import BytesIO
 from pathlib import Path
 from pprint import pformat
 from time import perf_counter
-from typing import Optional, TypeGuard
-
-import cv2
-import numpy as np
-import piexif
-from PIL import Image
-from sty import ef, fg, rs
+from typing import TYPE_CHECKING, Dict, Optional, Tuple, TypeGuard
 
 from pyimgtool.args import parse_args
-from pyimgtool.commands import mat, resize, sharpen, watermark
-from pyimgtool.data_structures import Img, Size
+from pyimgtool.data_structures import Img, PipelineState, Size
 from pyimgtool.exceptions import (
     ImageTooSmallError,
     OverlaySizeError,
     ResizeAttributeError,
     ResizeNotNeededError,
 )
-from pyimgtool.utils import generate_rgb_histogram, humanize_bytes, show_rgb_histogram
 
-logging.basicConfig(level=logging.WARNING)
+if TYPE_CHECKING:
+    import numpy as np
+
 LOG = logging.getLogger(__name__)
 
 
-def is_ndarray(val) -> TypeGuard[np.ndarray]:
+def is_ndarray(val) -> "TypeGuard[np.ndarray]":
+    import numpy as np
+
     return isinstance(val, np.ndarray)
 
 
+def load_exif(exif_bytes: Optional[bytes]) -> Dict:
+    """Parse raw exif segment from PIL image info.
+
+    Parameters
+    ----------
+    exif_bytes
+        Exif data as found in `Image.info["exif"]`
+
+    Returns
+    -------
+    Exif dict without thumbnail; empty ifds if there is no exif data
+    """
+    import piexif
+
+    if not exif_bytes:
+        return {ifd: {} for ifd in ("0th", "Exif", "GPS", "Interop", "1st")}
+    # parsing the segment PIL already read avoids reading the file again
+    ex = piexif.load(exif_bytes)
+    del ex["thumbnail"]
+    return ex
+
+
+def read_image(path: str) -> Img:
+    """Decode image file into BGR array with its metadata.
+
+    Parameters
+    ----------
+    path
+        Image file path
+
+    Returns
+    -------
+    Img
+    """
+    import cv2
+    from PIL import Image
+
+    # PIL only reads the header here; pixels are decoded by opencv
+    with Image.open(path) as _im:
+        info = _im.info
+    try:
+        ex = load_exif(info.get("exif"))
+        dpi = info["dpi"]
+    except KeyError:
+        ex = None
+        dpi = (0, 0)
+    # decode directly to BGR instead of PIL RGB -> ndarray -> BGR copies
+    data = cv2.imread(path, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    return Img(data, file_path=path, dpi=dpi, exif=ex)
+
+
+def resize_image(item: Img, arg: Namespace) -> Optional[Img]:
+    """Resize image with opencv according to resize2 args.
+
+    Parameters
+    ----------
+    item
+        Image to resize
+    arg
+        Parsed resize2 command args
+
+    Returns
+    -------
+    Resized image, `item` itself if no resize is needed, or None if it
+    could not be resized
+
+    Raises
+    ------
+    ResizeAttributeError
+        If args are not valid for resizing
+    """
+    import cv2
+
+    from pyimgtool.commands import resize
+
+    try:
+        resize_method, new_size = resize.get_method(
+            item.size,
+            width=arg.width,
+            height=arg.height,
+            scale=arg.scale,
+            longest=arg.longest,
+            shortest=arg.shortest,
+            force=arg.force,
+        )
+    except ResizeNotNeededError as e:
+        # already the requested size; pass it through untouched
+        LOG.warning(e)
+        return item
+    try:
+        _im = resize.resize_opencv(
+            resize_method, item.data, new_size, resample=cv2.INTER_AREA
+        )
+    except ImageTooSmallError as e:
+        LOG.warning(e)
+        return None
+    if _im is None:
+        LOG.error('Expected image from resize_opencv(), got None')
+        return None
+    return Img(_im)
+
+
+def handle_open(arg: Namespace, state: PipelineState):
+    """Open image for editing with PIL."""
+    import numpy as np
+    from PIL import Image
+
+    from pyimgtool.commands import resize
+    from pyimgtool.utils import (
+        generate_rgb_histogram,
+        humanize_bytes,
+        show_rgb_histogram,
+    )
+
+    state.in_file_path = arg.input.name
+    # stat the descriptor argparse already opened instead of the path again
+    state.in_file_size = os.fstat(arg.input.fileno()).st_size
+    arg.input.close()
+    # opened by path so PIL owns the file and closes it once pixels are loaded
+    im = Image.open(state.in_file_path)
+    state.in_format = im.format
+    state.in_image_size = Size(*im.size)
+    # raw metadata segments; can be handed back to the encoder as is
+    state.in_exif_bytes = im.info.get("exif")
+    state.in_icc_profile = im.info.get("icc_profile")
+    LOG.info("Input dims: %s", state.in_image_size)
+    try:
+        state.in_exif = load_exif(state.in_exif_bytes)
+        # LOG.debug("Exif: %s", in_exif)
+        state.in_dpi = im.info["dpi"]
+    except KeyError:
+        pass
+    LOG.info("Input file size: %s", humanize_bytes(state.in_file_size))
+    LOG.info("Input dpi: %s", state.in_dpi)
+    if arg.show_histogram:
+        LOG.debug("Generating thumbnail for histogram")
+        # only the thumbnail becomes an array; `im` stays a PIL image for the
+        # commands that follow
+        thumb = resize.resize_thumbnail(im.copy(), Size(1000, 1000))
+        thumb = np.asarray(thumb.convert("RGB"))
+        print(generate_rgb_histogram(thumb))
+        show_rgb_histogram(thumb)
+    state.im = im
+
+
+def handle_open2(arg: Namespace, state: PipelineState):
+    """Open images for editing with opencv."""
+    import cv2
+
+    from pyimgtool.commands import resize
+    from pyimgtool.utils import generate_rgb_histogram, show_rgb_histogram
+
+    # Test of opening multiple images for some operations, such as matting
+    # opencv releases the GIL while decoding, so files decode in parallel
+    paths = []
+    for f in arg.input:
+        paths.append(f.name)
+        f.close()
+    with ThreadPoolExecutor() as executor:
+        state.inputs.extend(executor.map(read_image, paths))
+    LOG.debug("Imgs: %s", state.inputs)
+    im = state.im = state.inputs[0].data
+    state.in_file_path = state.inputs[0].file_path
+    state.in_file_size = state.inputs[0].file_size
+    state.in_image_size = state.inputs[0].size
+    if arg.show_histogram:
+        if not is_ndarray(im):
+            raise TypeError('Expected numpy.ndarray')
+        LOG.debug("Generating numpy thumbnail for histogram")
+        thumb = resize.resize_thumbnail_opencv(im, Size(1000, 1000))
+        # histogram plots channels in rgb order
+        print(generate_rgb_histogram(cv2.cvtColor(thumb, cv2.COLOR_BGR2RGB)))
+        show_rgb_histogram(im)
+
+
+def handle_mat(arg: Namespace, state: PipelineState):
+    """Add mat to image."""
+    from pyimgtool.commands import mat
+
+    if not is_ndarray(state.im):
+        raise TypeError('Expected numpy.ndarray')
+    state.im = mat.create_mat(state.im, size_inches=arg.size)
+    state.modified = True
+    state.out_image_size = Size.from_np(state.im)
+
+
+def handle_resize(arg: Namespace, state: PipelineState):
+    """Resize image with PIL."""
+    import numpy as np
+    from PIL import Image
+
+    from pyimgtool.commands import resize
+
+    im = state.im
+    im = Image.fromarray(im) if type(im) == np.ndarray else im
+    if is_ndarray(im) or im is None:
+        raise TypeError('Expected Image, not ndarray')
+    orig_size = Size(*im.size)  # type: ignore
+    state.out_image_size = orig_size
+    try:
+        resize_method, new_size = resize.get_method(
+            orig_size,
+            width=arg.width,
+            height=arg.height,
+            scale=arg.scale,
+            longest=arg.longest,
+            shortest=arg.shortest,
+        )
+    except ResizeNotNeededError as e:
+        LOG.warning(e)
+    else:
+        # Resize/resample
+        try:
+            im = resize.resize(
+                resize_method,
+                im,
+                new_size,
+            )
+            state.modified = True
+        except ImageTooSmallError as e:
+            LOG.warning(e)
+        state.out_image_size = Size(*im.size)  # type: ignore
+    state.im = im
+
+
+def handle_resize2(arg: Namespace, state: PipelineState):
+    """Resize images with opencv."""
+    from sty import fg, rs
+
+    # threads rather than processes: opencv releases the GIL while
+    # resizing, and arrays don't need to be pickled between workers
+    try:
+        with ThreadPoolExecutor() as executor:
+            resized = list(executor.map(partial(resize_image, arg=arg), state.inputs))
+    except ResizeAttributeError as e:
+        print(f"{fg.li_red}error: {e}{rs.fg}", file=sys.stderr)
+        sys.exit(1)
+    state.processed.extend(item for item in resized if item is not None)
+    if not state.processed:
+        LOG.error("No images could be resized")
+        sys.exit(1)
+    state.modified = True
+    LOG.info(state.processed)
+    state.out_image_size = state.processed[0].size
+    state.im = state.processed[0].data
+
+
+def handle_text(arg: Namespace, state: PipelineState):
+    """Add text to image with PIL."""
+    from pyimgtool.commands import watermark
+
+    if state.im is None:
+        LOG.error('Image is None')
+        sys.exit(1)
+    state.im = watermark.with_text(
+        state.im,
+        text=arg.text,
+        copyright=arg.copyright,
+        scale=arg.scale,
+        position=arg.position,
+        opacity=arg.opacity,
+        exif=state.in_exif,
+    )  # type: ignore
+    state.modified = True
+
+
+def handle_text2(arg: Namespace, state: PipelineState):
+    """Add text to image array."""
+    import numpy as np
+    from PIL import Image
+
+    from pyimgtool.commands import watermark
+
+    im = watermark.with_text(
+        Image.fromarray(state.im),
+        text=arg.text,
+        copyright=arg.copyright,
+        scale=arg.scale,
+        position=arg.position,
+        opacity=arg.opacity,
+        exif=state.in_exif,
+    )
+    state.im = np.asarray(im)
+    state.modified = True
+
+
+def handle_watermark(arg: Namespace, state: PipelineState):
+    """Add watermark image with PIL."""
+    from pyimgtool.commands import watermark
+
+    arg.image.close()
+    watermark_image, mask = watermark.load_watermark(
+        arg.image.name, scale=arg.scale, opacity=arg.opacity
+    )
+    state.im = watermark.with_image(
+        state.im,
+        watermark_image,
+        position=arg.position,
+        padding=arg.margin,
+        invert=arg.invert,
+        mask=mask,
+    )
+    state.modified = True
+
+
+def handle_watermark2(arg: Namespace, state: PipelineState):
+    """Add watermark image with opencv."""
+    import cv2
+    from sty import fg, rs
+
+    from pyimgtool.commands import watermark
+
+    arg.image.close()
+    watermark_image = cv2.imread(arg.image.name, cv2.IMREAD_UNCHANGED)
+    # im = watermark.with_image_opencv(
+    #     im,
+    #     watermark_image,
+    #     scale=arg.scale,
+    #     position=arg.position,
+    #     opacity=arg.opacity,
+    #     padding=arg.margin,
+    # )
+    try:
+        state.im = watermark.overlay_transparent(
+            state.im,
+            watermark_image,
+            scale=arg.scale,
+            padding=arg.margin,
+            position=arg.position,
+            alpha=arg.opacity,
+            invert=arg.invert,
+        )
+    except OverlaySizeError as e:
+        print(f"{fg.li_red}error: {e}{rs.fg}", file=sys.stderr)
+        sys.exit(1)
+    state.modified = True
+
+
+def handle_sharpen(arg: Namespace, state: PipelineState):
+    """Sharpen image."""
+    from pyimgtool.commands import sharpen
+
+    state.im = sharpen.unsharp_mask(
+        state.im, amount=arg.amount, threshold=arg.threshold
+    )
+    state.modified = True
+
+
+def handle_save(arg: Namespace, state: PipelineState):
+    """Encode image and save to disk."""
+    import cv2
+    import piexif
+    from sty import ef, fg, rs
+
+    from pyimgtool.utils import humanize_bytes
+
+    im = state.im
+    in_file_path = state.in_file_path
+    out_exif: bytes = b""
+    # if type(im) == np.ndarray:
+    #     im = Image.fromarray(cv2.cvtColor(im, cv2.COLOR_BGR2RGB))
+    use_progressive_jpg = state.in_file_size > 10000
+    if use_progressive_jpg:
+        LOG.debug("Large file; using progressive jpg")
+
+    # Exif
+    if arg.keep_exif:
+        if state.in_exif_bytes is not None:
+            out_exif = state.in_exif_bytes
+        else:
+            # reuse exif parsed when the image was opened
+            in_exif = state.inputs[0].exif if state.inputs else state.in_exif
+            if in_exif is not None:
+                out_exif = piexif.dump(in_exif)
+
+    if arg.output is None:
+        root, _ = os.path.splitext(in_file_path)
+        out_file_path = f"{root}{arg.suffix}.jpg"
+    else:
+        out_file_path = arg.output
+    state.out_file_path = out_file_path
+
+    copy_input = (
+        not state.modified
+        and state.in_format == "JPEG"
+        and arg.jpg_quality is None
+        and arg.subsampling is None
+        and not arg.optimize_jpeg
+    )
+    jpg_quality = 75 if arg.jpg_quality is None else arg.jpg_quality
+    subsampling = 2 if arg.subsampling is None else arg.subsampling
+    if copy_input:
+        # pixels are unchanged, so skip the lossy decode/encode round trip
+        LOG.info("Image not modified; copying input jpeg data")
+        state.out_image_size = state.in_image_size
+        out_data = Path(in_file_path).read_bytes()
+        if not arg.keep_exif:
+            exif_removed = BytesIO()
+            piexif.remove(out_data, exif_removed)
+            out_data = exif_removed.getbuffer()
+    elif is_ndarray(im):
+        write_params = [
+            cv2.IMWRITE_JPEG_QUALITY,
+            jpg_quality,
+            cv2.IMWRITE_JPEG_OPTIMIZE,
+            int(arg.optimize_jpeg),
+            cv2.IMWRITE_JPEG_SAMPLING_FACTOR,
+            # Pillow-style subsampling setting -> opencv sampling factor
+            (
+                cv2.IMWRITE_JPEG_SAMPLING_FACTOR_444,
+                cv2.IMWRITE_JPEG_SAMPLING_FACTOR_422,
+                cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420,
+            )[subsampling],
+        ]
+        if use_progressive_jpg:
+            write_params += [
+                cv2.IMWRITE_JPEG_PROGRESSIVE,
+                1,
+            ]
+        _, buf = cv2.imencode(".jpg", im, write_params)
+        # write the encoded array as is rather than copying it into BytesIO
+        out_data = memoryview(buf)
+        if out_exif:
+            # opencv can't embed exif; splice it in before anything is written
+            # so the output file isn't read back and rewritten
+            exif_inserted = BytesIO()
+            piexif.insert(out_exif, out_data, exif_inserted)
+            out_data = exif_inserted.getbuffer()
+
+    def write_image(f):
+        """Write encoded image to file object."""
+        if copy_input or is_ndarray(im):
+            f.write(out_data)
+        else:
+            im.save(
+                f,
+                "JPEG",
+                quality=jpg_quality,
+                dpi=state.in_dpi,
+                progressive=use_progressive_jpg,
+                optimize=arg.optimize_jpeg,
+                subsampling=subsampling,
+                exif=out_exif,
+                icc_profile=state.in_icc_profile,
+            )
+
+    if arg.no_op:
+        # encode to memory only to report the output size
+        outbuf = BytesIO()
+        write_image(outbuf)
+        state.out_file_size = outbuf.tell()
+        LOG.info("Buffer output size: %s", humanize_bytes(state.out_file_size))
+        state.no_op = True
+        return
+
+    out_path = Path(out_file_path)
+    if out_path.exists() and not arg.force:
+        LOG.critical("file '%s' exists and force argument not found", out_path)
+        print(
+            f"{fg.red}{ef.bold}Error: file '{out_path}' exists;",
+            f" use -f option to force overwrite.{rs.all}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    # Create output dir if it doesn't exist
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    LOG.info("Saving image to %s", out_file_path)
+    # encoders stream into a temp file next to the output, which replaces the
+    # output only once encoding succeeded
+    fd, tmp_path = tempfile.mkstemp(
+        dir=out_path.parent, prefix=f".{out_path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_image(f)
+            state.out_file_size = f.tell()
+        # mkstemp creates the file private; give it the usual permissions
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    LOG.info("Output size: %s", humanize_bytes(state.out_file_size))
+
+
+HANDLERS = {
+    "open": handle_open,
+    "open2": handle_open2,
+    "mat": handle_mat,
+    "resize": handle_resize,
+    "resize2": handle_resize2,
+    "text": handle_text,
+    "text2": handle_text2,
+    "watermark": handle_watermark,
+    "watermark2": handle_watermark2,
+    "sharpen": handle_sharpen,
+    "save": handle_save,
+}
+
+
 def main():
     """Process image based on cli args."""
     time_start = perf_counter()
+    logging.basicConfig(level=logging.WARNING)
 
     args = parse_args(sys.argv[1:]).ordered()
+
     _, opts = next(args)
     log_level = 0
     try:
@@ -47,293 +552,29 @@ def main():
     except IndexError:
         log_level = 10
         mpl_log_level = log_level
-    loggers = [logging.getLogger(name) for name in logging.root.manager.loggerDict]
-    # set level for all loggers
+    # set level on root so loggers of modules imported by handlers inherit it
+    if log_level:
+        logging.getLogger().setLevel(log_level)
     # separate log level for matplotlib because it's so verbose
-    for logger in loggers:
-        if logger.name.startswith("matplotlib"):
-            logger.setLevel(mpl_log_level)
-        else:
-            logger.setLevel(log_level)
+    logging.getLogger("matplotlib").setLevel(mpl_log_level)
 
     LOG.debug("Program opts:\n%s", pformat(vars(opts)))
 
-    # main vars
-    inputs = []
-    processed = []
-    # im: Optional[Image.Image] = None
-    im: Image.Image | np.ndarray | None = None
-    in_file_path: Optional[str]
-    in_image_size = Size(0, 0)
-    in_file_size = 0
-    in_dpi = 0
-    in_exif: Optional[dict] = None
-    out_exif: bytes = b""
-    out_exif_size = 0
-    out_file_path = None
-    out_image_size = Size(0, 0)
-    out_file_size = 0
-    no_op = False
-
+    state = PipelineState()
     for cmd, arg in args:
         LOG.debug("Processing command %s with args:\n%s", cmd, pformat(vars(arg)))
-
-        if cmd == "open":
-            in_file_path = arg.input.name
-            in_file_size = os.path.getsize(in_file_path)  # type: ignore
-            im = Image.open(arg.input)
-            in_image_size = Size(*im.size)
-            LOG.info("Input dims: %s", in_image_size)
-            try:
-                in_exif = piexif.load(in_file_path)
-                del in_exif["thumbnail"]
-                # LOG.debug("Exif: %s", in_exif)
-                in_dpi = im.info["dpi"]
-            except KeyError:
-                pass
-            LOG.info("Input file size: %s", humanize_bytes(in_file_size))
-            LOG.info("Input dpi: %s", in_dpi)
-            if arg.show_histogram:
-                LOG.debug("Generating numpy thumbnail for histogram")
-                im = cv2.cvtColor(np.asarray(im), cv2.COLOR_RGB2BGR)
-                thumb = resize.resize_thumbnail_opencv(im, Size(1000, 1000))
-                print(generate_rgb_histogram(thumb))
-                show_rgb_histogram(im)
-        elif cmd == "open2":
-            # Test of opening multiple images for some operations, such as matting
-            for item in arg.input:
-                _im = Image.open(item)
-                try:
-                    ex = piexif.load(item.name)
-                    dpi = _im.info["dpi"]
-                    del ex["thumbnail"]
-                except KeyError:
-                    ex = None
-                    dpi = (0, 0)
-                _im = np.asarray(_im)
-                _im = cv2.cvtColor(_im, cv2.COLOR_RGB2BGR)
-                inputs.append(
-                    Img(
-                        _im,
-                        file_path=item.name,
-                        dpi=dpi,
-                        exif=ex,
-                    )
-                )
-            LOG.debug("Imgs: %s", inputs)
-            im = inputs[0].data
-            in_file_path = inputs[0].file_path
-            in_file_size = inputs[0].file_size
-            in_image_size = inputs[0].size
-            if arg.show_histogram:
-                if not is_ndarray(im):
-                    raise TypeError('Expected numpy.ndarray')
-                LOG.debug("Generating numpy thumbnail for histogram")
-                thumb = resize.resize_thumbnail_opencv(im, Size(1000, 1000))
-                print(generate_rgb_histogram(thumb))
-                show_rgb_histogram(im)
-        elif cmd == "mat":
-            if not is_ndarray(im):
-                raise TypeError('Expected numpy.ndarray')
-            im = mat.create_mat(im, size_inches=arg.size)
-            out_image_size = Size.from_np(im)
-        elif cmd == "resize":
-            im = Image.fromarray(im) if type(im) == np.ndarray else im
-            if is_ndarray(im) or im is None:
-                raise TypeError('Expected Image, not ndarray')
-            orig_size = Size(*im.size)  # type: ignore
-            out_image_size = orig_size
-            try:
-                resize_method, new_size = resize.get_method(
-                    orig_size,
-                    width=arg.width,
-                    height=arg.height,
-                    scale=arg.scale,
-                    longest=arg.longest,
-                    shortest=arg.shortest,
-                )
-            except ResizeNotNeededError as e:
-                LOG.warning(e)
-            else:
-                # Resize/resample
-                try:
-                    im = resize.resize(
-                        resize_method,
-                        im,
-                        new_size,
-                    )
-                except ImageTooSmallError as e:
-                    LOG.warning(e)
-                out_image_size = Size(*im.size)  # type: ignore
-        elif cmd == "resize2":
-            for item in inputs:
-                try:
-                    resize_method, new_size = resize.get_method(
-                        item.size,
-                        width=arg.width,
-                        height=arg.height,
-                        scale=arg.scale,
-                        longest=arg.longest,
-                        shortest=arg.shortest,
-                        force=arg.force,
-                    )
-                except ResizeNotNeededError as e:
-                    LOG.warning(e)
-                except ResizeAttributeError as e:
-                    print(f"{fg.li_red}error: {e}{rs.fg}", file=sys.stderr)
-                    sys.exit(1)
-                else:
-                    try:
-                        _im = resize.resize_opencv(
-                            resize_method, item.data, new_size, resample=cv2.INTER_AREA
-                        )
-                        if _im is not None:
-                            processed.append(Img(_im))
-                        else:
-                            LOG.error('Expected image from resize_opencv(), got None')
-                    except ImageTooSmallError as e:
-                        LOG.warning(e)
-            LOG.info(processed)
-            out_image_size = processed[0].size
-            im = processed[0].data
-        elif cmd == "text":
-            if im is None:
-                LOG.error('Image is None')
-                return
-            im = watermark.with_text(
-                im,
-                text=arg.text,
-                copyright=arg.copyright,
-                scale=arg.scale,
-                position=arg.position,
-                opacity=arg.opacity,
-                exif=in_exif,
-            )  # type: ignore
-        elif cmd == "text2":
-            im = watermark.with_text(
-                Image.fromarray(im),
-                text=arg.text,
-                copyright=arg.copyright,
-                scale=arg.scale,
-                position=arg.position,
-                opacity=arg.opacity,
-                exif=in_exif,
-            )
-            im = np.asarray(im)
-        elif cmd == "watermark":
-            im = watermark.with_image(
-                im,
-                Image.open(arg.image),
-                scale=arg.scale,
-                position=arg.position,
-                padding=arg.margin,
-                opacity=arg.opacity,
-                invert=arg.invert,
-            )
-        elif cmd == "watermark2":
-            watermark_image = cv2.imread(arg.image.name, cv2.IMREAD_UNCHANGED)
-            # im = watermark.with_image_opencv(
-            #     im,
-            #     watermark_image,
-            #     scale=arg.scale,
-            #     position=arg.position,
-            #     opacity=arg.opacity,
-            #     padding=arg.margin,
-            # )
-            try:
-                im = watermark.overlay_transparent(
-                    im,
-                    watermark_image,
-                    scale=arg.scale,
-                    padding=arg.margin,
-                    position=arg.position,
-                    alpha=arg.opacity,
-                    invert=arg.invert,
-                )
-            except OverlaySizeError as e:
-                print(f"{fg.li_red}error: {e}{rs.fg}", file=sys.stderr)
-                sys.exit(1)
-        elif cmd == "sharpen":
-            im = sharpen.unsharp_mask(im, amount=arg.amount, threshold=arg.threshold)
-        elif cmd == "save":
-            # if type(im) == np.ndarray:
-            #     im = Image.fromarray(cv2.cvtColor(im, cv2.COLOR_BGR2RGB))
-            use_progressive_jpg = in_file_size > 10000
-            if use_progressive_jpg:
-                LOG.debug("Large file; using progressive jpg")
-
-            # Exif
-            if arg.keep_exif:
-                out_exif = piexif.dump(piexif.load(in_file_path))
-                out_exif_size = sys.getsizeof(out_exif)
-
-            outbuf = BytesIO()
-            try:
-                im.save(
-                    outbuf,
-                    "JPEG",
-                    quality=arg.jpg_quality,
-                    dpi=in_dpi,
-                    progressive=use_progressive_jpg,
-                    optimize=True,
-                    exif=out_exif,
-                )
-            except AttributeError:
-                write_params = [
-                    cv2.IMWRITE_JPEG_QUALITY,
-                    arg.jpg_quality,
-                    cv2.IMWRITE_JPEG_OPTIMIZE,
-                ]
-                if use_progressive_jpg:
-                    write_params += [
-                        cv2.IMWRITE_JPEG_PROGRESSIVE,
-                    ]
-                _, buf = cv2.imencode(".jpg", im, write_params)
-                outbuf = BytesIO(buf)
-            image_buffer = outbuf.getbuffer()
-            out_file_size = image_buffer.nbytes + out_exif_size
-            LOG.info("Buffer output size: %s", humanize_bytes(out_file_size))
-
-            if arg.output is None:
-                root, _ = os.path.splitext(in_file_path)
-                out_file_path = f"{root}{arg.suffix}.jpg"
-            else:
-                out_file_path = arg.output.name
-
-            if arg.no_op:
-                no_op = True
-                continue
-            LOG.info("Saving buffer to %s", out_file_path)
-            if (out_path := Path(out_file_path)).exists():
-                if not arg.force:
-                    LOG.critical(
-                        "file '%s' exists and force argument not found", out_path
-                    )
-                    print(
-                        f"{fg.red}{ef.bold}Error: file '{out_path}' exists;",
-                        f" use -f option to force overwrite.{rs.all}",
-                        file=sys.stderr,
-                    )
-                    return
-                # Create output dir if it doesn't exist
-                out_path.parent.mkdir(parents=True, exist_ok=True)
-
-            with out_path.open("wb") as f:
-                f.write(image_buffer)
-                if arg.keep_exif:
-                    piexif.insert(out_exif, out_file_path)
-                out_file_size = os.path.getsize(out_file_path)
+        HANDLERS[cmd](arg, state)
 
     elapsed = perf_counter() - time_start
     report = generate_report(
-        in_file_size,
-        out_file_size,
-        in_file_path,
-        out_file_path,
-        in_image_size,
-        out_image_size,
+        state.in_file_size,
+        state.out_file_size,
+        state.in_file_path,
+        state.out_file_path,
+        state.in_image_size,
+        state.out_image_size,
         elapsed,
-        no_op,
+        state.no_op,
     )
     print(report)
 
@@ -376,49 +617,44 @@ def generate_report(
     str:
         Report text
     """
+    from sty import ef, fg, rs
+
+    from pyimgtool.utils import humanize_bytes
+
     size_delta_bytes = out_file_size - in_file_size
     in_relative = os.path.relpath(in_file_path)
-    out_relative = os.path.relpath(out_file_path)
     no_op_msg = "**Image not saved due to -n flag; reporting only**"
     report_title = " Processing Summary "
     report_end = " End "
     report_arrow = "->"
-    report = []
-    report.append(
-        [
-            "File Name:",
-            in_relative,
-            report_arrow if out_file_path is not None else "",
-            out_relative if out_file_path is not None else "",
-        ]
-    )
-    report.append(
-        ["Image Size:", str(in_image_size), report_arrow, str(out_image_size)]
-    )
-    # TODO: black up arrow \u25b2 throws UnicodeEncodeError on Windows when used with `fd -x`
-    report.append(
-        [
+
+    def report_row(label: str, before: str, after: str) -> Tuple[str, str, str, str]:
+        # unchanged values are only shown once
+        if after == before:
+            return label, before, "", "  "
+        return label, before, report_arrow, after
+
+    report = [
+        report_row("File Name:", in_relative, os.path.relpath(out_file_path))
+        if out_file_path is not None
+        else ("File Name:", in_relative, "", ""),
+        report_row("Image Size:", str(in_image_size), str(out_image_size)),
+        # TODO: black up arrow \u25b2 throws UnicodeEncodeError on Windows when used with `fd -x`
+        report_row(
             "File Size:",
             humanize_bytes(in_file_size),
-            report_arrow,
             f"{humanize_bytes(out_file_size)} (▲ {(size_delta_bytes/in_file_size) * 100:2.1f}%)",
-        ]
-    )
-    report.append(["Elapsed:", f"{elapsed_time*1000:.1f} ms"])
-    for c in report:
-        for n in range(4):
-            try:
-                c[n] = c[n]
-            except IndexError:
-                c.append("")
-        c[2] = "" if c[3] == c[1] else c[2]
-        c[3] = "  " if c[3] == c[1] else c[3]
-
+        ),
+        ("Elapsed:", f"{elapsed_time*1000:.1f} ms", "", ""),
+    ]
     padding = 2
-    col0w = max([len(str(c[0])) for c in report]) + padding
-    col1w = max([len(str(c[1])) for c in report]) + padding
-    col2w = max([len(str(c[2])) for c in report]) + padding
-    col3w = max([len(str(c[3])) for c in report]) + padding
+    widths = [0, 0, 0, 0]
+    for c in report:
+        for i in range(4):
+            n = len(c[i])
+            if n > widths[i]:
+                widths[i] = n
+    col0w, col1w, col2w, col3w = (w + padding for w in widths)
     out = []
     out.append(
         f"{ef.b}{report_title:{'-'}^{col0w + col1w + col2w + col3w + 1}}{rs.all}"
@@ -162,7 +162,7 @@ def resize_cover(image: PILImage, size: Size, resample=Image.LANCZOS) -> PILImag
     """
     img_format = image.format
     img = image.copy()
-    img_size = Size(img.size)
+    img_size = Size(*img.size)
     ratio = max((size.w / img_size.w), (size.h / img_size.h))
     new_size = (
         int(math.ceil(img_size.w * ratio)),
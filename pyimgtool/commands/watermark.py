@@ -1,8 +1,9 @@
 """Watermark image with text or another image."""
 
 import logging
+import os
 from datetime import datetime
-from pathlib import PurePath
+from functools import lru_cache
 from typing import Any, Dict, Tuple
 
 import cv2
@@ -17,6 +18,8 @@ from pyimgtool.exceptions import OverlaySizeError
 
 LOG = logging.getLogger(__name__)
 
+FONT_PATH = os.path.join(utils.get_pkg_root(), "fonts", "SourceSansPro-Regular.ttf")
+
 
 def get_region_stats(im: PILImage, region: Box) -> Stat:
     """Get ImageStat object for region of PIL image.
@@ -31,10 +34,10 @@ def get_region_stats(im: PILImage, region: Box) -> Stat:
     Returns: ImageStat object with stats
     """
     LOG.debug("Region for stats: %s", region)
-    m = Image.new("L", im.size, 0)
-    drawing_layer = ImageDraw.Draw(m)
-    drawing_layer.rectangle(tuple(region), fill=255)
-    st = ImageStat.Stat(im, mask=m)
+    x0, y0, x1, y1 = region
+    # crop instead of masking a full-size copy; the box is inclusive, as
+    # drawn by ImageDraw.rectangle
+    st = ImageStat.Stat(im.crop((x0, y0, x1 + 1, y1 + 1)))
     return Stat(stddev=st.stddev[0], mean=st.mean[0])
 
 
@@ -44,7 +47,7 @@ def get_region_stats_np(im: np.ndarray, region: Box) -> Stat:
     Parameters
     ----------
     im : np.ndarray
-        Input image to analyze
+        Input image to analyze, grayscale or BGR
     region : Box
         Coordinates for region
 
@@ -54,12 +57,15 @@ def get_region_stats_np(im: np.ndarray, region: Box) -> Stat:
         Stat object containing various statistics of region
     """
     x0, y0, x1, y1 = region
-    dtype = np.float64
-    im = im[y0:y1, x0:x1].copy()
+    im = im[y0:y1, x0:x1]
+    if im.ndim == 3:
+        # convert just the region instead of the whole image
+        im = cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
     # utils.show_histogram(im)
-    stddev = np.std(im, dtype=dtype)
-    mean = np.mean(im, dtype=dtype)
-    return Stat(stddev=stddev, mean=mean, data=im.astype(np.uint8))
+    # single pass over the (possibly strided) region for both values
+    mean, stddev = cv2.meanStdDev(im)
+    # region is kept as is (a view for gray input) for debug histograms
+    return Stat(stddev=stddev[0, 0], mean=mean[0, 0], data=im)
 
 
 def find_best_location(
@@ -70,22 +76,30 @@ def find_best_location(
     The best location is the one with least luminance variance.
 
     Args:
-        im: PIL Image
+        im: Grayscale PIL Image
         size: Size of watermark image
         padding: Proportion of padding to add around watermark
 
     Returns: Position object
     """
-    im_size = Size(*im.size)
-    positions = []
-    for p in Position:
-        if p is not Position.CENTER:
-            pos = p.calculate_for_overlay(im_size, size, padding)
-            st = get_region_stats(im, pos)
-            positions.append((p, pos, st))
-    LOG.debug("Positions: %s", positions)
-    # utils.show_image_cv2(im)
-    return min(positions, key=lambda i: i[2].weighted_dev)
+    # stats over array slices of the candidate boxes only; a masked
+    # ImageStat per candidate reads the whole image each time
+    return find_best_position(np.asarray(im), size, padding)
+
+
+@lru_cache(maxsize=16)
+def _candidate_boxes(
+    im_size: Tuple[int, int], size: Tuple[int, int], padding: float
+) -> Tuple[Tuple[Position, Tuple[int, int, int, int]], ...]:
+    """Get watermark box coords for each candidate position; cached by dims.
+
+    Coords are cached as plain tuples, since `Box` is mutable.
+    """
+    return tuple(
+        (p, tuple(p.calculate_for_overlay(Size(*im_size), Size(*size), padding)))
+        for p in Position
+        if p is not Position.CENTER
+    )
 
 
 def find_best_position(
@@ -98,7 +112,7 @@ def find_best_position(
     Parameters
     ----------
     im
-        Image array
+        Image array, grayscale or BGR
     size
         Size of watermark image
     padding
@@ -108,15 +122,13 @@ def find_best_position(
     -------
     Position, Box, Stat
     """
-    im_size = Size.from_np(im)
+    boxes = _candidate_boxes(tuple(Size.from_np(im)), tuple(size), padding)
     positions = []
-    for p in Position:
-        if p is not Position.CENTER:
-            pos = p.calculate_for_overlay(im_size, size, padding)
-            st = get_region_stats_np(im, pos)
-            positions.append((p, pos, st))
+    for p, coords in boxes:
+        pos = Box(*coords)
+        positions.append((p, pos, get_region_stats_np(im, pos)))
     LOG.debug("Positions: %s", positions)
-    if LOG.level == logging.DEBUG:
+    if LOG.isEnabledFor(logging.DEBUG):
         # show histograms for debugging
         utils.show_position_histograms(positions)
     return min(positions, key=lambda i: i[2].weighted_dev)
@@ -144,6 +156,81 @@ def get_copyright_string(exif: Dict[Any, Any]) -> str:
     return f"© {copyright_year}"
 
 
+def prepare_watermark(
+    watermark_image: PILImage, scale: float | None = None, opacity: float = 0.3,
+) -> Tuple[PILImage, PILImage]:
+    """Convert and scale watermark image and build its opacity mask.
+
+    Parameters
+    ----------
+    watermark_image
+        PIL Image
+    scale
+        Scale for watermark size
+    opacity
+        Watermark layer opacity from 0 to 1
+
+    Returns
+    -------
+    RGBA watermark image, L mask
+    """
+    watermark_image = watermark_image.convert("RGBA")
+    LOG.info("Watermark: %s", watermark_image.size)
+    if scale is not None and scale != 1:
+        watermark_image = resize_height(
+            watermark_image,
+            Size(
+                int(watermark_image.width * scale), int(watermark_image.height * scale)
+            ),
+        )
+        LOG.debug("New watermark dims: %s", watermark_image.size)
+    # 256-entry lookup table; no python callback per pixel value. getchannel
+    # copies only the alpha band, split() would copy all four
+    mask = watermark_image.getchannel("A").point(
+        [round(i * opacity) for i in range(256)]
+    )
+    return watermark_image, mask
+
+
+@lru_cache(maxsize=4)
+def _load_watermark(
+    path: str, mtime: float, scale: float | None, opacity: float
+) -> Tuple[bytes, bytes, Tuple[int, int]]:
+    """Decode and prepare watermark file; cached by path and mtime."""
+    with Image.open(path) as watermark_image:
+        watermark_image, mask = prepare_watermark(watermark_image, scale, opacity)
+    return watermark_image.tobytes(), mask.tobytes(), watermark_image.size
+
+
+def load_watermark(
+    path: str, scale: float | None = None, opacity: float = 0.3
+) -> Tuple[PILImage, PILImage]:
+    """Open watermark file and prepare it for `with_image`.
+
+    Prepared pixel data is cached, so repeated calls for the same file
+    skip decoding, resizing and building the mask.
+
+    Parameters
+    ----------
+    path
+        Watermark image file
+    scale
+        Scale for watermark size
+    opacity
+        Watermark layer opacity from 0 to 1
+
+    Returns
+    -------
+    RGBA watermark image, L mask
+    """
+    data, mask, size = _load_watermark(path, os.path.getmtime(path), scale, opacity)
+    # frombuffer shares the cached bytes instead of copying them
+    return (
+        Image.frombuffer("RGBA", size, data, "raw", "RGBA", 0, 1),
+        Image.frombuffer("L", size, mask, "raw", "L", 0, 1),
+    )
+
+
 def with_image(
     im: PILImage,
     watermark_image: PILImage,
@@ -152,6 +239,7 @@ def with_image(
     opacity: float = 0.3,
     padding: float = 0.05,
     invert: bool = False,
+    mask: PILImage | None = None,
 ) -> PILImage:
     """Watermark with image according to Config.
 
@@ -171,31 +259,28 @@ def with_image(
         Proportion of watermark image to use as padding
     invert
         Invert watermark image
+    mask
+        Mask from `prepare_watermark` or `load_watermark`; if given,
+        `watermark_image` is used as is and `scale` and `opacity` are ignored
 
     Returns
     -------
     PIL Image with watermark
     """
-    watermark_image = watermark_image.convert("RGBA")
-    LOG.info("Watermark: %s", watermark_image.size)
-    if scale is not None and scale != 1:
-        watermark_image = resize_height(
-            watermark_image,
-            Size(
-                int(watermark_image.width * scale), int(watermark_image.height * scale)
-            ),
-        )
-        LOG.debug("New watermark dims: %s", watermark_image.size)
+    if mask is None:
+        watermark_image, mask = prepare_watermark(watermark_image, scale, opacity)
     watermark_size = Size(*watermark_image.size)
-    mask = watermark_image.split()[3].point(lambda i: i * opacity)
-    im_gray = im.convert("L")
     if position is None:
+        # grayscale copy is only needed to pick a position
+        im_gray = im.convert("L")
         position, bx, stat = find_best_location(im_gray, watermark_size, padding)
         LOG.info("Best detected watermark loc: %s", position)
         LOG.debug("find_best_location() stats: %s", stat)
     else:
         LOG.info("Position from args: %s", position)
         bx = position.calculate_for_overlay(Size(*im.size), watermark_size, padding)
+    # masked paste blends only the watermark box in C; alpha_composite would
+    # need RGBA copies of the base (or its region) and is slower
     im.paste(watermark_image, bx[:2], mask)
     return im
 
@@ -219,10 +304,9 @@ def with_image_opencv(
         opacity: Watermark layer opacity from 0 to 1
         padding: Pixels of padding for watermark
 
-    Returns: Watermarked image array
+    Returns: Watermarked image array (`im` is modified in place)
     """
     LOG.info("Inserting watermark at position: %s", position)
-    orig_im_type = im.dtype
     new_size = Size.calculate_new(Size.from_np(watermark_image), scale)
     watermark_image = cv2.resize(
         watermark_image, tuple(new_size), interpolation=cv2.INTER_AREA
@@ -238,14 +322,57 @@ def with_image_opencv(
     )
     wH, wW = watermark_image.shape[:2]
     h, w = im.shape[:2]
-    im = np.dstack([im, np.ones((h, w), dtype=im.dtype)])
-    overlay = np.zeros((h, w, 4), dtype=im.dtype)
     ww, hh, _, _ = position.calculate_for_overlay(Size(w, h), Size(wW, wH))
     LOG.debug("hh: %d, ww: %d", hh, ww)
-    overlay[hh : hh + wH, ww : ww + wH] = watermark_image
-    output = im.copy()
-    cv2.addWeighted(overlay, opacity, output, 1.0, 0, output)
-    return output.astype(orig_im_type)
+    # blend color channels in place on the watermark region only
+    roi = im[hh : hh + wH, ww : ww + wW]
+    cv2.addWeighted(watermark_image[..., :3], opacity, roi, 1.0, 0, roi)
+    return im
+
+
+@lru_cache(maxsize=8)
+def _blend_tables(alpha: float, invert: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Get lookup tables of background and overlay terms for `_blend_overlay`.
+
+    Blend weight is the overlay value scaled by alpha, in 1/256ths, so both
+    terms depend only on the overlay byte; any inversion is folded into the
+    overlay table instead of copying the overlay.
+    """
+    values = np.arange(256, dtype=np.uint16)
+    alpha_lut = (values * round(alpha * 256)) >> 8
+    if invert:
+        values = 255 - values
+    tables = 256 - alpha_lut, values * alpha_lut
+    for table in tables:
+        # cached and shared between calls
+        table.flags.writeable = False
+    return tables
+
+
+def _blend_overlay(
+    roi: np.ndarray, overlay_image: np.ndarray, alpha: float, invert: bool
+):
+    """Blend overlay into image region in place.
+
+    Parameters
+    ----------
+    roi
+        BGR image region, modified in place
+    overlay_image
+        BGR overlay of the same size as `roi`
+    alpha
+        Blend opacity, from 0 to 1
+    invert
+        Invert overlay image
+    """
+    bg_lut, overlay_lut = _blend_tables(alpha, invert)
+    # contiguous color channels keep the opencv kernels below on their fast
+    # path; strided channel views are much slower
+    overlay_image = np.ascontiguousarray(overlay_image)
+    # roi * (256 - weight) + weighted overlay, then back to 8 bits in place
+    blended = cv2.multiply(roi, cv2.LUT(overlay_image, bg_lut), dtype=cv2.CV_16U)
+    cv2.add(blended, cv2.LUT(overlay_image, overlay_lut), blended)
+    np.right_shift(blended, 8, out=roi, casting="unsafe")
 
 
 def overlay_transparent(
@@ -289,48 +416,39 @@ def overlay_transparent(
             resample = cv2.INTER_CUBIC
         overlay = cv2.resize(overlay, None, fx=scale, fy=scale, interpolation=resample)  # type: ignore
     LOG.debug("Overlay shape: %s", overlay.shape)
-    h, w, c = overlay.shape
+    h, w = overlay.shape[:2]
     LOG.debug(
         "Calculated margin for overlay: %s", Size(*[int(i * padding) for i in (w, h)])
     )
-    bg_gray = cv2.cvtColor(background, cv2.COLOR_BGR2GRAY)
-    bg_gray = bg_gray.astype(np.float64)
+    # check before any region stats; an oversized overlay leaves them empty
+    if w > bg_w or h > bg_h:
+        message = f"Overlay size of {Size(w, h)} is too large for image size {Size(bg_w, bg_h)}"
+        LOG.error(message)
+        raise OverlaySizeError(message)
     if position is None:
-        pos, bx, stat = find_best_position(bg_gray, Size(w, h), padding)
+        pos, bx, stat = find_best_position(background, Size(w, h), padding)
         LOG.debug("Best calculated position: %s=%s, %s", pos, bx, stat)
     else:
         bx = position.calculate_for_overlay(
             Size.from_np(background), Size.from_np(overlay), padding
         )
-        stat = get_region_stats_np(bg_gray, bx)
+        stat = get_region_stats_np(background, bx)
         LOG.debug("Position from args: %s=%s, %s", position, bx, stat)
-    if (bx.x1 - bx.x0) > bg_w or (bx.y1 - bx.y0) > bg_h:
-        message = f"Overlay size of {Size(w, h)} is too large for image size {Size(bg_w, bg_h)}"
-        LOG.error("%s; this should be unreachable", message)
-        raise OverlaySizeError(message)
-    if c == 3:
-        shape = h, w, 1
-        LOG.debug("Adding alpha channel for overlay of shape: %s", shape)
-        overlay = np.concatenate(
-            [overlay, np.ones(shape, dtype=overlay.dtype) * 255.0], axis=2,
-        )
-    overlay_image = overlay[..., :3]
-    mask = overlay_image / 256.0 * alpha
-
     invert_overlay = stat.mean > 128.0
-    # Combine images, inverting overlay if necessary
     if invert_overlay:
         LOG.debug("Inverting based on luminance: %s", stat.mean)
-        overlay_image = ~overlay_image
-    if invert:
-        # Invert whether or not we automatically inverted
-        overlay_image = ~overlay_image
-    background[bx.y0 : bx.y1, bx.x0 : bx.x1] = (1.0 - mask) * background[
-        bx.y0 : bx.y1, bx.x0 : bx.x1
-    ] + mask * overlay_image
+    roi = background[bx.y0 : bx.y1, bx.x0 : bx.x1]
+    # Invert whether or not we automatically inverted
+    _blend_overlay(roi, overlay[..., :3], alpha, invert_overlay ^ invert)
     return background
 
 
+@lru_cache(maxsize=32)
+def _truetype(font_path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Load font at size; cached so each size is parsed only once."""
+    return ImageFont.truetype(font=font_path, size=size)
+
+
 def with_text(
     im: PILImage,
     text: str,
@@ -364,31 +482,36 @@ def with_text(
         text = f"{get_copyright_string(exif)} {text}"
     layer = Image.new("RGBA", (im.width, im.height), (255, 255, 255, 0))
 
-    font_size = 1  # starting size
-    font_path = ""
+    font_size = 100  # size to measure text at
+    font_path = FONT_PATH
     offset_x = padding
     offset_y = padding
 
     try:
-        font_path = str(
-            PurePath.joinpath(
-                utils.get_pkg_root(), "fonts", "SourceSansPro-Regular.ttf"
-            )
-        )
-        font = ImageFont.truetype(font=font_path, size=font_size)
+        font = _truetype(font_path, font_size)
     except OSError:
         LOG.error("Could not find font '%s', aborting text watermark", font_path)
         return im
 
     LOG.debug("Found font '%s'", font_path)
-    while font.getsize(text)[0] < scale * im.width:
-        # iterate until text size is >= text_scale
+    max_width = scale * im.width
+    # text width scales about linearly with font size, so start from the
+    # estimate and only step over rounding in glyph metrics
+    font_size = max(1, int(max_width * font_size / font.getsize(text)[0]))
+    font = _truetype(font_path, font_size)
+    while font.getsize(text)[0] < max_width:
         font_size += 1
-        font = ImageFont.truetype(font=font_path, size=font_size)
+        font = _truetype(font_path, font_size)
+    while font_size > 1:
+        smaller = _truetype(font_path, font_size - 1)
+        if smaller.getsize(text)[0] < max_width:
+            break
+        font_size -= 1
+        font = smaller
 
-    if font.getsize(text)[0] > scale * im.width:
+    if font.getsize(text)[0] > max_width:
         font_size -= 1
-        font = ImageFont.truetype(font=font_path, size=font_size)
+        font = _truetype(font_path, font_size)
 
     text_width, text_height = font.getsize(text)
     LOG.debug(
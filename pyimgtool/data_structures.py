@@ -7,9 +7,10 @@ import os
 from dataclasses import astuple, dataclass, field
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-import numpy as np
+if TYPE_CHECKING:
+    import numpy as np
 
 LOG = logging.getLogger(__name__)
 
@@ -71,6 +72,11 @@ class Position(Enum):
             strings.append(p.value)
         return strings
 
+    @classmethod
+    def lookup(cls) -> Dict[str, Position]:
+        """Return mapping of lowercase names and values to members."""
+        return {**{str(p): p for p in cls}, **{p.value: p for p in cls}}
+
     def calculate_for_overlay(
         self, im_size: Size, overlay_size: Size, padding: float = 0.0
     ) -> Box:
@@ -267,8 +273,8 @@ class Box:
 class Stat:
     """Image statistics."""
 
-    stddev: np.float64 = np.float64(0.0)
-    mean: np.float64 = np.float64(0.0)
+    stddev: np.float64 | float = 0.0
+    mean: np.float64 | float = 0.0
     data: np.ndarray | None = field(default=None, repr=False)
 
     def __str__(self):
@@ -281,3 +287,25 @@ class Stat:
         """Luminance deviation multiplied by how close the average is to 0 or 255."""
         distance = abs(self.mean - 128) / 128.0
         return float(self.stddev - (self.stddev * distance) * 0.5)
+
+
+@dataclass(slots=True)
+class PipelineState:
+    """Image and metadata passed between chained commands."""
+
+    im: Any = None
+    inputs: List[Img] = field(default_factory=list)
+    processed: List[Img] = field(default_factory=list)
+    in_file_path: Optional[str] = None
+    in_file_size: int = 0
+    in_format: Optional[str] = None
+    in_image_size: Size = field(default_factory=Size)
+    in_dpi: Tuple[int, int] = (0, 0)
+    in_exif: Optional[Dict] = field(default=None, repr=False)
+    in_exif_bytes: Optional[bytes] = field(default=None, repr=False)
+    in_icc_profile: Optional[bytes] = field(default=None, repr=False)
+    out_file_path: Optional[str] = None
+    out_file_size: int = 0
+    out_image_size: Size = field(default_factory=Size)
+    no_op: bool = False
+    modified: bool = False
@@ -1,14 +1,15 @@
 """Helper functions."""
 import logging
+import math
+import os
 import platform
 import re
+import sys
 import time
 from functools import wraps
-from pathlib import PurePath
 from typing import Sequence, Tuple
 
 import cv2
-import matplotlib.pyplot as plt
 import numpy as np
 import plotille
 
@@ -16,6 +17,8 @@ from pyimgtool.data_structures import Box, Position, Stat
 
 LOG = logging.getLogger(__name__)
 
+_UNITS = ("", "k", "M", "G", "T", "P", "E", "Z", "Y")
+
 
 class Log:
     """Decorator class to log fn execution time and parameters."""
@@ -51,9 +54,9 @@ class Log:
         return wrapper
 
 
-def get_pkg_root() -> PurePath:
+def get_pkg_root() -> str:
     """Return package root folder."""
-    return PurePath(__file__).parent
+    return os.path.dirname(os.path.abspath(__file__))
 
 
 def escape_ansi(line: str) -> str:
@@ -83,13 +86,21 @@ def humanize_bytes(
 
     Returns: Human-readable string representation of bytes
     """
-    div = 1000.0 if si_prefix else 1024.0
     unit_suffix = "i" if si_prefix else ""
-    for unit in ["", "k", "M", "G", "T", "P", "E", "Z"]:
-        if abs(num) < div:
-            return f"{num:3.{round_digits}f} {unit}{unit_suffix}{suffix}"
-        num /= div
-    return f"{num:3.{round_digits}f} Y{unit_suffix}{suffix}"
+    magnitude = abs(num)
+    # index unit directly instead of dividing in a loop
+    if magnitude < 1:
+        idx = 0
+    elif si_prefix:
+        idx = int(math.log10(magnitude)) // 3
+        if magnitude < 1000 ** idx:
+            # float error at exact powers of 10
+            idx -= 1
+    else:
+        idx = (int(magnitude).bit_length() - 1) // 10
+    idx = min(idx, len(_UNITS) - 1)
+    num /= 1000.0 ** idx if si_prefix else float(1 << (idx * 10))
+    return f"{num:3.{round_digits}f} {_UNITS[idx]}{unit_suffix}{suffix}"
 
 
 def rgba2rgb(rgba: np.ndarray, background=(255, 255, 255)) -> np.ndarray:
@@ -136,11 +147,22 @@ def equalize_hsv(image):
     return eq_image
 
 
+def gui_available() -> bool:
+    """Check whether blocking gui windows can be shown.
+
+    Windows only, and only for interactive runs so headless or batch
+    invocations never wait on a window that nobody will close.
+    """
+    return platform.system() == "Windows" and sys.stdin.isatty()
+
+
 def show_image_plt(im: np.ndarray):
     """Show image in matplotlib window."""
-    if platform.system() != "Windows":
-        LOG.info("Cannot show plot on this OS")
+    if not gui_available():
+        LOG.info("Cannot show plot on this OS or without a terminal")
         return
+    import matplotlib.pyplot as plt
+
     plt.set_loglevel("info")
     plt.figure()
     cmap = None
@@ -154,8 +176,8 @@ def show_image_plt(im: np.ndarray):
 
 def show_image_cv2(im: np.ndarray):
     """Show image in window."""
-    if platform.system() != "Windows":
-        LOG.info("Cannot show plot on this OS")
+    if not gui_available():
+        LOG.info("Cannot show plot on this OS or without a terminal")
         return
     cv2.namedWindow(
         "image",
@@ -174,8 +196,10 @@ def show_histogram(im: np.ndarray):
     im : np.ndarray
         Image
     """
-    if platform.system() != "Windows":
+    if not gui_available():
         return
+    import matplotlib.pyplot as plt
+
     if len(im.shape) > 2:
         LOG.debug("Converting image to grayscale for histogram plot")
         im = cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
@@ -197,8 +221,10 @@ def show_rgb_histogram(im: np.ndarray):
     im : np.ndarray
         Image to plot
     """
-    if platform.system() != "Windows":
+    if not gui_available():
         return
+    import matplotlib.pyplot as plt
+
     chans = cv2.split(im)
     colors = ("r", "g", "b")
     plt.figure()
@@ -221,8 +247,10 @@ def show_position_histograms(positions: Sequence[Tuple[Position, Box, Stat]]):
     positions
         Iterable containing position, box, stat
     """
-    if platform.system() != "Windows":
+    if not gui_available():
         return
+    import matplotlib.pyplot as plt
+
     fig, axs = plt.subplots(3, 2, sharex=True, sharey=True)
     for ax, (pos, _, stat) in zip(axs.flat, positions):
         hist = cv2.calcHist([stat.data], [0], None, [256], [0, 256])
@@ -299,12 +327,13 @@ def generate_rgb_histogram(im: np.ndarray, show_axes: bool = False) -> str:
 
     img_h, img_w, img_c = img.shape
     colors = ["red", "green", "blue"]
-    chans = cv2.split(img)
+    bins = np.arange(hist_bins)
+    flat = img.reshape(-1, img_c)
 
-    # for i in range(img_c):
-    for (chan, color) in zip(chans, colors):
-        hist_data, bins = np.histogram(chan, bins=hist_bins, range=(0, 255))
-        fig.plot(bins[:hist_bins], hist_data, lc=color)
+    # count uint8 values directly instead of np.histogram's bin search
+    for i, color in enumerate(colors):
+        hist_data = np.bincount(flat[:, i], minlength=hist_bins)
+        fig.plot(bins, hist_data, lc=color)
     if not show_axes:
         graph = (
             "\n".join(